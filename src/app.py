@@ -2,28 +2,103 @@
 import streamlit as st
 import yaml
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from pdf_processor import PDFProcessor
-from llm_client import LLMClient
+from llm_client import LLMClient, count_tokens
 from results_manager import ResultsManager
 
 st.set_page_config(page_title="Evidence Base Classifier")
 
+# Prefer libyaml's C loader/dumper when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+class ModelKind(Enum):
+    """Provider family of a selectable model."""
+    OPENAI = "openai"
+    CLAUDE = "claude"
+
+# Selectable models, in sidebar order, and the provider each one uses
+MODEL_KINDS = {
+    "o3": ModelKind.OPENAI,
+    "claude-opus-4": ModelKind.CLAUDE,
+}
+
+# Upper bound on PDFs processed concurrently (LLM calls are network-bound)
+MAX_CONCURRENT_FILES = 8
+
+# Per-minute request and token budgets the LLM client paces itself to, so
+# concurrent files wait their turn instead of piling into 429 retries.
+# Defaults match usage tier 1 for o3 and Claude Opus 4; raise them to your
+# organization's limits (None disables a limit)
+OPENAI_RPM = 500
+OPENAI_TPM = 30000
+ANTHROPIC_RPM = 50
+ANTHROPIC_TPM = 30000  # Input tokens per minute
+
+# LLM clients kept alive for different API key pairs; the least recently used is closed
+LLM_CLIENT_CACHE_SIZE = 2
+
+# Successful analyses are cached here and reused for identical papers
+LLM_CACHE_PATH = ".llm_cache/responses.sqlite"
+
+# Claude documents above this size get a long-wait notice
+LARGE_DOCUMENT_TOKENS = 150000
+
+# Longer selections are listed inside a collapsed expander
+FILE_LIST_EXPANDED_MAX = 10
+
+# Key format checks only look at prefixes, so only this many characters of each key are cached
+API_KEY_PREFIX_LENGTH = len("sk-ant-")
+
+# Per-file messages are rendered in batches of this size, or at least this often
+RENDER_BATCH_SIZE = 5
+RENDER_INTERVAL_SECONDS = 0.25
+
 # --- Config file management ---
+@st.cache_resource(show_spinner=False)
 def get_config_path():
-    """Get the path to the config file."""
+    """Get the path to the config file, creating its directory once per process."""
     home_dir = Path.home()
     config_dir = home_dir / ".evidence_base_classifier"
     config_dir.mkdir(exist_ok=True)
     return config_dir / "config.yaml"
 
-def load_config():
+def get_config_version():
+    """Get the config file's (mtime_ns, size), or None if it does not exist.
+    
+    The size catches two saves within one tick of a coarse filesystem clock.
+    """
+    try:
+        stat = get_config_path().stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_config_cached(config_path, version):
+    """Parse the config file; keyed on its version so edits on disk invalidate it.
+    
+    Only the latest parse is kept, so keys removed from the file do not linger in memory.
+    """
+    with open(config_path, 'rb') as f:
+        return yaml.load(f, Loader=YAML_LOADER) or {}
+
+def load_config(version=None):
     """Load configuration from file."""
-    config_path = get_config_path()
-    if config_path.exists():
+    if version is None:
+        version = get_config_version()
+    if version is not None:
         try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f) or {}
+            return _load_config_cached(str(get_config_path()), version)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             st.error(f"Error loading config: {e}")
     return {}
@@ -33,16 +108,19 @@ def save_config(config):
     config_path = get_config_path()
     try:
         with open(config_path, 'w') as f:
-            yaml.dump(config, f, default_flow_style=False)
+            yaml.dump(config, f, Dumper=YAML_DUMPER, default_flow_style=False)
         return True
     except Exception as e:
         st.error(f"Error saving config: {e}")
         return False
 
-# Load existing config
-if 'config_loaded' not in st.session_state:
-    st.session_state.config = load_config()
+# Load existing config, reparsing only when the file changes on disk
+config_version = get_config_version()
+if 'config_loaded' not in st.session_state or st.session_state.get("config_version") != config_version:
+    st.session_state.config = load_config(config_version)
+    st.session_state.config_version = config_version
     st.session_state.config_loaded = True
+config = st.session_state.config
 
 st.title("Evidence Base Classifier")
 
@@ -51,9 +129,10 @@ with st.sidebar:
     st.header("API Keys")
     
     # Get default values from config
-    default_openai_key = st.session_state.config.get("openai_api_key", "")
-    default_anthropic_key = st.session_state.config.get("anthropic_api_key", "")
-    default_model = st.session_state.config.get("model_selection", "o3")
+    default_openai_key = config.get("openai_api_key", "")
+    default_anthropic_key = config.get("anthropic_api_key", "")
+    default_model = config.get("model_selection", "o3")
+    default_save_enabled = config.get("save_enabled", False)
     
     openai_api_key = st.text_input("OpenAI API Key", 
                                    value=default_openai_key if default_openai_key else "",
@@ -67,7 +146,7 @@ with st.sidebar:
                                       help="Get your Anthropic API key from: https://console.anthropic.com/ (starts with 'sk-ant-')")
 
     st.header("Model Selection")
-    model_options = ["o3", "claude-opus-4"]
+    model_options = list(MODEL_KINDS)
     default_index = model_options.index(default_model) if default_model in model_options else 0
     model_selection = st.selectbox(
         "Select Model",
@@ -78,7 +157,7 @@ with st.sidebar:
     
     st.header("Configuration")
     save_config_enabled = st.checkbox("Save API keys and settings to config file", 
-                                     value=st.session_state.config.get("save_enabled", False))
+                                     value=default_save_enabled)
     
     col1, col2 = st.columns(2)
     
@@ -92,27 +171,26 @@ with st.sidebar:
                     "save_enabled": save_config_enabled
                 }
                 if save_config(config_to_save):
-                    st.session_state.config = config_to_save
+                    config = st.session_state.config = config_to_save
                     st.success("Configuration saved successfully!")
                 else:
                     st.error("Failed to save configuration.")
             else:
                 # Clear saved config if user disabled saving
                 if save_config({"save_enabled": False}):
-                    st.session_state.config = {"save_enabled": False}
+                    config = st.session_state.config = {"save_enabled": False}
                     st.success("Configuration cleared!")
     
     with col2:
         if st.button("🗑️ Clear Saved Config", help="Delete saved configuration file and reset to defaults"):
             try:
-                config_path = get_config_path()
-                if config_path.exists():
-                    config_path.unlink()  # Delete the file
-                    st.session_state.config = {}
-                    st.success("✅ Saved configuration cleared! Please refresh the page.")
-                    st.info("🔄 Refresh the page to see the changes take effect.")
-                else:
-                    st.info("No saved configuration found to clear.")
+                get_config_path().unlink()  # Delete the file
+                _load_config_cached.clear()  # And the parsed copy, keys included
+                config = st.session_state.config = {}
+                st.success("✅ Saved configuration cleared! Please refresh the page.")
+                st.info("🔄 Refresh the page to see the changes take effect.")
+            except FileNotFoundError:
+                st.info("No saved configuration found to clear.")
             except Exception as e:
                 st.error(f"Failed to clear configuration: {e}")
     
@@ -121,58 +199,73 @@ with st.sidebar:
     else:
         st.info("API keys will not be saved (enable checkbox to persist settings)")
     
-    # Show current config status
-    if st.session_state.config and any(key in st.session_state.config for key in ["openai_api_key", "anthropic_api_key"]):
-        with st.expander("📋 Current Saved Configuration", expanded=False):
+    # Show current config status; the body is only built while the toggle is on
+    if "openai_api_key" in config or "anthropic_api_key" in config:
+        if st.checkbox("📋 Show saved configuration", value=False, key="show_saved_config"):
+            saved_openai_key = config.get("openai_api_key")
+            saved_anthropic_key = config.get("anthropic_api_key")
             st.write("**Saved settings:**")
-            if "openai_api_key" in st.session_state.config and st.session_state.config["openai_api_key"]:
-                key_preview = st.session_state.config["openai_api_key"][:8] + "..." if len(st.session_state.config["openai_api_key"]) > 8 else "Set"
+            if saved_openai_key:
+                key_preview = saved_openai_key[:8] + "..." if len(saved_openai_key) > 8 else "Set"
                 st.write(f"• OpenAI API Key: {key_preview}")
-            if "anthropic_api_key" in st.session_state.config and st.session_state.config["anthropic_api_key"]:
-                key_preview = st.session_state.config["anthropic_api_key"][:10] + "..." if len(st.session_state.config["anthropic_api_key"]) > 10 else "Set"
+            if saved_anthropic_key:
+                key_preview = saved_anthropic_key[:10] + "..." if len(saved_anthropic_key) > 10 else "Set"
                 st.write(f"• Anthropic API Key: {key_preview}")
-            if "model_selection" in st.session_state.config:
-                st.write(f"• Model: {st.session_state.config['model_selection']}")
+            if "model_selection" in config:
+                st.write(f"• Model: {config['model_selection']}")
             st.warning("💡 If keys were saved incorrectly, use 'Clear Saved Config' button above")
 
 # Check for conditions that should prevent processing.
-is_claude_selected = "claude" in model_selection.lower()
-is_openai_selected = "o3" in model_selection.lower()
+model_kind = MODEL_KINDS[model_selection]
 
 # Validate API key formats
-def validate_api_keys():
-    """Validate that API keys match their expected formats."""
+@st.cache_data(show_spinner=False, max_entries=16)
+def validate_api_keys(openai_api_key, anthropic_api_key, saved_openai, saved_anthropic):
+    """Validate that API keys match their expected formats.
+    
+    Pure in its four inputs, so reruns with unchanged keys hit the cache.
+    Callers pass only the first API_KEY_PREFIX_LENGTH characters of each
+    key, so full secrets never end up in the cache.
+    
+    Returns:
+        Tuple of issue messages (empty if all keys look valid)
+    """
+    # Nothing typed or saved yet - skip all prefix checks
+    if not (openai_api_key or anthropic_api_key or saved_openai or saved_anthropic):
+        return ()
+    
     issues = []
     
+    # 'sk-proj-' project keys are covered by the generic 'sk-' prefix
     if openai_api_key:
         if openai_api_key.startswith('sk-ant-'):
             issues.append("❌ **OpenAI API Key field contains an Anthropic key!** Please check your keys.")
-        elif openai_api_key.startswith('sk-proj-'):
-            # This is likely a project-specific OpenAI key - should be valid
-            pass
         elif not openai_api_key.startswith('sk-'):
             issues.append("⚠️ OpenAI API Key should start with 'sk-'")
     
-    if anthropic_api_key:
-        if anthropic_api_key.startswith('sk-') and not anthropic_api_key.startswith('sk-ant-'):
+    if anthropic_api_key and not anthropic_api_key.startswith('sk-ant-'):
+        if anthropic_api_key.startswith('sk-'):
             issues.append("❌ **Anthropic API Key field contains an OpenAI key!** Please check your keys.")
-        elif not anthropic_api_key.startswith('sk-ant-'):
+        else:
             issues.append("⚠️ Anthropic API Key should start with 'sk-ant-'")
     
     # Check for potential saved config conflicts
-    saved_openai = st.session_state.config.get("openai_api_key", "")
-    saved_anthropic = st.session_state.config.get("anthropic_api_key", "")
-    
     if saved_openai and saved_openai.startswith('sk-ant-'):
         issues.append("🚨 **Saved OpenAI key is actually an Anthropic key!** Use 'Clear Saved Config' button.")
     
     if saved_anthropic and saved_anthropic.startswith('sk-') and not saved_anthropic.startswith('sk-ant-'):
         issues.append("🚨 **Saved Anthropic key is actually an OpenAI key!** Use 'Clear Saved Config' button.")
     
-    return issues
+    return tuple(issues)
 
-key_validation_issues = validate_api_keys()
-is_api_key_missing = (is_openai_selected and not openai_api_key) or (is_claude_selected and not anthropic_api_key)
+key_validation_issues = validate_api_keys(
+    openai_api_key[:API_KEY_PREFIX_LENGTH],
+    anthropic_api_key[:API_KEY_PREFIX_LENGTH],
+    (config.get("openai_api_key") or "")[:API_KEY_PREFIX_LENGTH],
+    (config.get("anthropic_api_key") or "")[:API_KEY_PREFIX_LENGTH]
+)
+is_api_key_missing = ((model_kind is ModelKind.OPENAI and not openai_api_key)
+                      or (model_kind is ModelKind.CLAUDE and not anthropic_api_key))
 has_key_format_errors = len(key_validation_issues) > 0
 
 with st.sidebar:
@@ -183,6 +276,139 @@ with st.sidebar:
         for issue in key_validation_issues:
             st.error(issue)
 
+# --- Cached processing resources ---
+@st.cache_resource(show_spinner=False)
+def ensure_output_dirs():
+    """Create the output and logs directories once per process."""
+    Path("output").mkdir(exist_ok=True)
+    Path("logs").mkdir(exist_ok=True)
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_processor():
+    """Get a PDF processor shared across reruns."""
+    return PDFProcessor()
+
+@st.cache_resource(show_spinner=False)
+def _llm_client_registry():
+    """LLM clients by API key pair, least recently used first, with the lock guarding them."""
+    return OrderedDict(), threading.Lock()
+
+def get_llm_client(openai_api_key, anthropic_api_key):
+    """
+    Get an initialized LLM client, reused while the API keys are unchanged.
+    
+    Each client owns an event-loop thread, a connection pool and a cache
+    connection, so at most LLM_CLIENT_CACHE_SIZE are kept and evicted ones
+    are closed rather than left running for the server's lifetime.
+    """
+    clients, lock = _llm_client_registry()
+    key_pair = (openai_api_key, anthropic_api_key)
+    with lock:
+        llm_client = clients.pop(key_pair, None)
+        if llm_client is None:
+            llm_client = LLMClient(
+                openai_rpm=OPENAI_RPM, openai_tpm=OPENAI_TPM,
+                anthropic_rpm=ANTHROPIC_RPM, anthropic_tpm=ANTHROPIC_TPM,
+                cache_path=LLM_CACHE_PATH
+            )
+            llm_client.initialize_clients(
+                openai_api_key=openai_api_key,
+                anthropic_api_key=anthropic_api_key
+            )
+        clients[key_pair] = llm_client
+        while len(clients) > LLM_CLIENT_CACHE_SIZE:
+            _, evicted_client = clients.popitem(last=False)
+            evicted_client.close()
+    return llm_client
+
+def process_pdf(uploaded_file, position, pdf_processor, llm_client, model_selection, events):
+    """
+    Run one PDF through readability check, text extraction, LLM analysis and validation.
+    
+    Runs on a worker thread, so it must not call Streamlit directly; status
+    messages are pushed onto the events queue for the main thread to render.
+    
+    Returns:
+        Tuple of (extracted_text, llm_result, display_error, logged_error)
+    """
+    filename = uploaded_file.name
+    events.put(f"Processing {filename}... {position}")
+    
+    try:
+        # Steps 1-2: Check readability and extract text (OCR fallback) in one pass,
+        # reusing the text of any identical PDF seen before.
+        # UploadedFile is itself an in-memory BytesIO, so it is handed to the
+        # PDF parser as-is rather than copied out with read(); only large PDFs
+        # split across worker processes need a bytes copy.
+        extracted_text, error_msg = pdf_processor.extract_text_cached(uploaded_file, filename)
+        
+        if error_msg:
+            return "", {}, error_msg, error_msg
+        
+        # Step 3: Analyze with LLM
+        # Give user feedback about processing time for large documents
+        if model_kind is ModelKind.CLAUDE and count_tokens(extracted_text) > LARGE_DOCUMENT_TOKENS:
+            events.put(f"⏳ Analyzing large document {filename} with {model_selection}... This may take several minutes. {position}")
+        else:
+            events.put(f"Analyzing {filename} with {model_selection}... {position}")
+        
+        llm_result, analysis_success, error_msg = llm_client.analyze_paper(
+            extracted_text, filename, model_selection
+        )
+        
+        if not analysis_success:
+            return extracted_text, {}, f"LLM analysis failed - {error_msg}", f"LLM analysis failed: {error_msg}"
+        
+        # Step 4: Validate result
+        is_valid, validation_error = llm_client.validate_result(llm_result)
+        
+        if not is_valid:
+            return extracted_text, {}, f"Invalid LLM response - {validation_error}", f"Invalid LLM response: {validation_error}"
+        
+        return extracted_text, llm_result, None, None
+    
+    except Exception as e:
+        error_msg = f"Unexpected error: {str(e)}"
+        return "", {}, error_msg, error_msg
+
+def render_outcomes(container, outcomes, model_selection, show_details):
+    """Render a batch of per-file outcomes into container in a single pass."""
+    with container:
+        for filename, extracted_text, llm_result, display_error in outcomes:
+            if display_error:
+                st.error(f"❌ {filename}: {display_error}")
+                continue
+            
+            # Display success with key details
+            decision = llm_result.get('inclusion_decision', 'Unknown')
+            category = llm_result.get('category', 'Unknown')
+            title = llm_result.get('article_title', 'Unknown')
+            
+            if decision == "Included":
+                st.success(f"✅ {filename}: **INCLUDED** ({category}) - {title}")
+            else:
+                st.info(f"ℹ️ {filename}: **EXCLUDED** - {title}")
+            
+            if not show_details:
+                continue
+            
+            # Show detailed result in expander
+            with st.expander(f"Analysis Details: {filename}"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("**Decision:**", decision)
+                    st.write("**Category:**", category)
+                    st.write("**Title:**", title)
+                with col2:
+                    st.write("**Text Length:**", f"{len(extracted_text):,} characters")
+                    st.write("**Model Used:**", model_selection)
+                
+                st.write("**Justification:**")
+                st.write(llm_result.get('justification', 'N/A'))
+                
+                st.write("**Detailed Reasoning:**")
+                st.write(llm_result.get('detailed_reasoning', 'N/A'))
+
 # --- Main app logic ---
 if 'status' not in st.session_state:
     st.session_state.status = "Idle"
@@ -201,29 +427,34 @@ uploaded_files = st.file_uploader(
 
 if uploaded_files:
     st.write(f"📁 **{len(uploaded_files)} PDF file(s) selected:**")
-    for file in uploaded_files:
-        st.write(f"• {file.name}")
+    file_list = "\n".join(f"- {file.name}" for file in uploaded_files)
+    if len(uploaded_files) > FILE_LIST_EXPANDED_MAX:
+        with st.expander("Show file list", expanded=False):
+            st.markdown(file_list)
+    else:
+        st.markdown(file_list)
 
+    show_details = st.checkbox("Show analysis details for each file", value=True,
+                               help="Turn off to keep the page light when processing large batches")
+    
     # Disable button if API key is missing or has format errors
     processing_disabled = is_api_key_missing or has_key_format_errors
     
     if st.button("Process PDFs", disabled=processing_disabled):
         st.session_state.status = "Processing"
         
-        # Initialize processors
-        pdf_processor = PDFProcessor()
-        llm_client = LLMClient()
-        results_manager = ResultsManager(model_name=model_selection)
-        
-        # Initialize LLM client with API keys
-        llm_client.initialize_clients(
-            openai_api_key=openai_api_key if openai_api_key else None,
-            anthropic_api_key=anthropic_api_key if anthropic_api_key else None
+        # Reuse cached processors; results are collected fresh for every run
+        pdf_processor = get_pdf_processor()
+        llm_client = get_llm_client(
+            openai_api_key if openai_api_key else None,
+            anthropic_api_key if anthropic_api_key else None
         )
+        # Rows are appended to the output CSVs as each file finishes; files finish
+        # seconds apart, so flushing every row costs nothing and survives a crash
+        results_manager = ResultsManager(model_name=model_selection, stream_dir="output", flush_every=1)
         
         # Ensure output and logs directories exist
-        os.makedirs("output", exist_ok=True)
-        os.makedirs("logs", exist_ok=True)
+        ensure_output_dirs()
         
         total_files = len(uploaded_files)
         st.write(f"🔄 **Processing {total_files} PDF files...**")
@@ -232,93 +463,73 @@ if uploaded_files:
         progress_bar = st.progress(0)
         status_text = st.empty()
         stats_container = st.empty()
+        results_log = st.container()
+        pending_outcomes = []
+        last_render = time.monotonic()
         
-        for i, uploaded_file in enumerate(uploaded_files):
-            # Update progress
-            progress = (i + 1) / total_files
-            progress_bar.progress(progress)
-            status_text.write(f"Processing {uploaded_file.name}... ({i + 1} of {total_files})")
+        # Process files concurrently; all Streamlit calls stay on this thread
+        events = queue.Queue()
+        executor = ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_FILES, total_files))
+        try:
+            position_fmt = f"({{}} of {total_files})"
+            futures = {
+                executor.submit(
+                    process_pdf, uploaded_file, position_fmt.format(i + 1),
+                    pdf_processor, llm_client, model_selection, events
+                ): uploaded_file
+                for i, uploaded_file in enumerate(uploaded_files)
+            }
+            pending = set(futures)
+            completed = 0
             
-            try:
-                # Step 1: Check if PDF is readable
-                is_readable, error_msg = pdf_processor.is_pdf_readable(uploaded_file, uploaded_file.name)
-                
-                if not is_readable:
-                    st.error(f"❌ {uploaded_file.name}: {error_msg}")
-                    results_manager.add_error(uploaded_file.name, error_msg)
-                    continue
-                
-                # Step 2: Extract text with OCR fallback
-                extracted_text, extraction_success, error_msg = pdf_processor.extract_text_from_pdf(uploaded_file, uploaded_file.name)
-                
-                if not extraction_success:
-                    st.error(f"❌ {uploaded_file.name}: Text extraction failed - {error_msg}")
-                    results_manager.add_error(uploaded_file.name, f"Text extraction failed: {error_msg}")
-                    continue
-                
-                # Step 3: Analyze with LLM
-                # Give user feedback about processing time for large documents
-                estimated_tokens = len(extracted_text) // 4
-                if "claude" in model_selection.lower() and estimated_tokens > 150000:
-                    status_text.write(f"⏳ Analyzing large document {uploaded_file.name} with {model_selection}... This may take several minutes. ({i + 1} of {total_files})")
-                else:
-                    status_text.write(f"Analyzing {uploaded_file.name} with {model_selection}... ({i + 1} of {total_files})")
-                
-                llm_result, analysis_success, error_msg = llm_client.analyze_paper(
-                    extracted_text, uploaded_file.name, model_selection
-                )
+            while pending:
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
                 
-                if not analysis_success:
-                    st.error(f"❌ {uploaded_file.name}: LLM analysis failed - {error_msg}")
-                    results_manager.add_error(uploaded_file.name, f"LLM analysis failed: {error_msg}")
-                    continue
+                # Show the most recent worker status message
+                latest_event = None
+                while not events.empty():
+                    latest_event = events.get_nowait()
+                if latest_event:
+                    status_text.write(latest_event)
                 
-                # Step 4: Validate result
-                is_valid, validation_error = llm_client.validate_result(llm_result)
+                # Files finishing in the same poll share one row timestamp
+                with results_manager.batch():
+                    for future in done:
+                        uploaded_file = futures[future]
+                        extracted_text, llm_result, display_error, logged_error = future.result()
+                        
+                        # Update progress
+                        completed += 1
+                        progress_bar.progress(completed / total_files)
+                        
+                        if logged_error:
+                            results_manager.add_error(uploaded_file.name, logged_error)
+                        else:
+                            results_manager.add_result(llm_result, uploaded_file.name)
+                        pending_outcomes.append((uploaded_file.name, extracted_text, llm_result, display_error))
                 
-                if not is_valid:
-                    st.error(f"❌ {uploaded_file.name}: Invalid LLM response - {validation_error}")
-                    results_manager.add_error(uploaded_file.name, f"Invalid LLM response: {validation_error}")
-                    continue
+                if done:
+                    # Update stats display
+                    stats = results_manager.get_stats()
+                    stats_container.write(f"**Progress:** Successful: {stats['successful']}, Failed: {stats['failed']}, Remaining: {total_files - stats['total_processed']}")
                 
-                # Step 5: Store successful result
-                results_manager.add_result(llm_result, uploaded_file.name)
-                
-                # Display success with key details
-                decision = llm_result.get('inclusion_decision', 'Unknown')
-                category = llm_result.get('category', 'Unknown')
-                title = llm_result.get('article_title', 'Unknown')
-                
-                if decision == "Included":
-                    st.success(f"✅ {uploaded_file.name}: **INCLUDED** ({category}) - {title}")
-                else:
-                    st.info(f"ℹ️ {uploaded_file.name}: **EXCLUDED** - {title}")
-                
-                # Show detailed result in expander
-                with st.expander(f"Analysis Details: {uploaded_file.name}"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write("**Decision:**", decision)
-                        st.write("**Category:**", category)
-                        st.write("**Title:**", title)
-                    with col2:
-                        st.write("**Text Length:**", f"{len(extracted_text):,} characters")
-                        st.write("**Model Used:**", model_selection)
-                    
-                    st.write("**Justification:**")
-                    st.write(llm_result.get('justification', 'N/A'))
-                    
-                    st.write("**Detailed Reasoning:**")
-                    st.write(llm_result.get('detailed_reasoning', 'N/A'))
-                    
-            except Exception as e:
-                error_msg = f"Unexpected error: {str(e)}"
-                st.error(f"❌ {uploaded_file.name}: {error_msg}")
-                results_manager.add_error(uploaded_file.name, error_msg)
+                # Flush buffered per-file messages in batches
+                if pending_outcomes and (len(pending_outcomes) >= RENDER_BATCH_SIZE
+                                         or time.monotonic() - last_render >= RENDER_INTERVAL_SECONDS):
+                    render_outcomes(results_log, pending_outcomes, model_selection, show_details)
+                    pending_outcomes = []
+                    last_render = time.monotonic()
             
-            # Update stats display
-            stats = results_manager.get_stats()
-            stats_container.write(f"**Progress:** Successful: {stats['successful']}, Failed: {stats['failed']}, Remaining: {total_files - stats['total_processed']}")
+            executor.shutdown()
+        except BaseException:
+            # Streamlit stops or reruns the script by raising from the next st.* call;
+            # drop the queued files instead of analyzing them for a discarded run
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            results_manager.close()
+        
+        render_outcomes(results_log, pending_outcomes, model_selection, show_details)
         
         # Final status update
         progress_bar.progress(1.0)
@@ -330,20 +541,19 @@ if uploaded_files:
         # Display failed files table if any failures occurred
         if results_manager.errors:
             st.write("### Failed Files")
-            failed_files_data = results_manager.get_failed_files_for_display()
+            failed_files_data = list(results_manager.get_failed_files_for_display())
             st.dataframe(failed_files_data, use_container_width=True)
         
-        # Export results and provide download links
+        # Export results to disk and serve downloads from memory
         if results_manager.results:
             try:
                 csv_filepath = results_manager.export_to_csv()
-                with open(csv_filepath, 'rb') as f:
-                    st.download_button(
-                        label="📊 Download Results CSV",
-                        data=f.read(),
-                        file_name=os.path.basename(csv_filepath),
-                        mime='text/csv'
-                    )
+                st.download_button(
+                    label="📊 Download Results CSV",
+                    data=results_manager.export_to_csv_bytes(),
+                    file_name=os.path.basename(csv_filepath),
+                    mime='text/csv'
+                )
             except Exception as e:
                 st.error(f"Error exporting results: {e}")
         
@@ -352,23 +562,21 @@ if uploaded_files:
             try:
                 # CSV export
                 error_csv_filepath = results_manager.export_errors_to_csv()
-                with open(error_csv_filepath, 'rb') as f:
-                    st.download_button(
-                        label="📋 Download Error Log CSV",
-                        data=f.read(),
-                        file_name=os.path.basename(error_csv_filepath),
-                        mime='text/csv'
-                    )
+                st.download_button(
+                    label="📋 Download Error Log CSV",
+                    data=results_manager.export_errors_to_csv_bytes(),
+                    file_name=os.path.basename(error_csv_filepath),
+                    mime='text/csv'
+                )
                 
                 # Text export
                 error_txt_filepath = results_manager.export_errors_to_text()
-                with open(error_txt_filepath, 'rb') as f:
-                    st.download_button(
-                        label="📝 Download Error Log TXT",
-                        data=f.read(),
-                        file_name=os.path.basename(error_txt_filepath),
-                        mime='text/plain'
-                    )
+                st.download_button(
+                    label="📝 Download Error Log TXT",
+                    data=results_manager.export_errors_to_text_bytes(),
+                    file_name=os.path.basename(error_txt_filepath),
+                    mime='text/plain'
+                )
             except Exception as e:
                 st.error(f"Error exporting error logs: {e}")
 
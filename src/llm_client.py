@@ -1,53 +1,95 @@
+import asyncio
+import functools
 import json
 import logging
+import random
+import threading
 import time
-from typing import Dict, Any, Optional, Tuple
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+import openai
+from openai import AsyncOpenAI
 import anthropic
+import fastjsonschema
+import json_repair
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+try:
+    # Optional: exact token counts instead of the 4-characters-per-token estimate
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-class LLMClient:
-    """LLM client supporting both OpenAI and Anthropic APIs with structured output."""
-    
-    def __init__(self):
-        self.openai_client = None
-        self.anthropic_client = None
-        
-        # JSON schema for structured output
-        self.json_schema = {
-            "type": "object",
-            "properties": {
-                "article_title": {
-                    "type": "string",
-                    "description": "Title of the academic article under review"
-                },
-                "inclusion_decision": {
-                    "type": "string",
-                    "description": "Inclusion or exclusion decision for the paper",
-                    "enum": ["Included", "Excluded"]
-                },
-                "justification": {
-                    "type": "string",
-                    "description": "Brief justification for the inclusion/exclusion decision"
-                },
-                "category": {
-                    "type": "string",
-                    "description": "The category assigned to the included paper. Required for all outputs (N/A if excluded).",
-                    "enum": ["Client", "FLW", "Feasibility", "Data", "Grey Literature", "N/A"]
-                },
-                "detailed_reasoning": {
-                    "type": "string",
-                    "description": "Detailed reasoning for the inclusion or exclusion decision, reflecting critical review and criteria."
-                }
-            },
-            "required": ["article_title", "inclusion_decision", "justification", "category", "detailed_reasoning"],
-            "additionalProperties": False
+# Connection pool shared by both SDK clients; sized well above any realistic
+# concurrency so the pool never becomes the bottleneck before API rate limits
+HTTP_LIMITS = httpx.Limits(max_connections=2000, max_keepalive_connections=1500)
+# Long reads are expected: non-streaming o3 reasoning on a large paper can take minutes
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# Retries after a 429 (on top of the SDKs' own), with jittered exponential backoff
+RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_BACKOFF_SECONDS = 5.0
+
+# Tokenizer used for size checks and rate limiting; Claude's tokenizer differs
+# slightly, but far less than a fixed characters-per-token ratio
+TOKEN_ENCODING = "o200k_base"
+
+# JSON schema for structured output
+JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "article_title": {
+            "type": "string",
+            "description": "Title of the academic article under review"
+        },
+        "inclusion_decision": {
+            "type": "string",
+            "description": "Inclusion or exclusion decision for the paper",
+            "enum": ["Included", "Excluded"]
+        },
+        "justification": {
+            "type": "string",
+            "description": "Brief justification for the inclusion/exclusion decision"
+        },
+        "category": {
+            "type": "string",
+            "description": "The category assigned to the included paper. Required for all outputs (N/A if excluded).",
+            "enum": ["Client", "FLW", "Feasibility", "Data", "Grey Literature", "N/A"]
+        },
+        "detailed_reasoning": {
+            "type": "string",
+            "description": "Detailed reasoning for the inclusion or exclusion decision, reflecting critical review and criteria."
         }
-        
-        # System prompt for the research assistant
-        self.system_prompt = """You are an expert research assistant tasked with analyzing academic papers to determine their inclusion in the CommCare Evidence Base. Your role is to thoroughly read each paper and make classification decisions based on specific criteria.
+    },
+    "required": ["article_title", "inclusion_decision", "justification", "category", "detailed_reasoning"],
+    "additionalProperties": False
+}
+
+# JSON_SCHEMA compiled to a Python validator once, at import
+SCHEMA_VALIDATOR = fastjsonschema.compile(JSON_SCHEMA)
+
+# Several short papers can share one request, answered with one review per paper
+PACKED_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reviews": {
+            "type": "array",
+            "description": "One review per paper, in the order the papers were given",
+            "items": JSON_SCHEMA
+        }
+    },
+    "required": ["reviews"],
+    "additionalProperties": False
+}
+PACKED_PAPER_MAX_TOKENS = 8000  # Only papers at most this long are packed together
+PACKED_REQUEST_MAX_TOKENS = 60000  # Combined length of the papers in one packed request
+
+# System prompt for the research assistant
+SYSTEM_PROMPT = """You are an expert research assistant tasked with analyzing academic papers to determine their inclusion in the CommCare Evidence Base. Your role is to thoroughly read each paper and make classification decisions based on specific criteria.
 
 # Your Task
 For each paper provided, you must:
@@ -128,61 +170,285 @@ You must use the paper_review tool to provide your structured analysis. The tool
 
 Always use the paper_review tool to submit your analysis."""
 
+def load_json_lenient(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse JSON produced by a model, repairing it if needed.
+    
+    Truncated objects, code fences and stray prose around the JSON are
+    tolerated, so a missing closing brace does not cost a full re-run.
+    Returns None if nothing usable can be recovered.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    
+    repaired = json_repair.loads(text)
+    return repaired if isinstance(repaired, dict) and repaired else None
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once, or None if it is unavailable (not installed, or offline on first use)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {TOKEN_ENCODING}, estimating 4 characters per token: {e}")
+        return None
+
+@functools.lru_cache(maxsize=64)
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text, falling back to 1 token ≈ 4 characters without tiktoken.
+    
+    Cached so the size check and the rate limiter share one count per paper.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+class LLMClient:
+    """LLM client supporting both OpenAI and Anthropic APIs with structured output.
+    
+    Requests are made with the SDKs' async clients on a single background event
+    loop owned by this instance, so concurrent analyses from any number of
+    threads share one connection pool. The synchronous analyze_* methods are
+    thin wrappers around their *_async counterparts.
+    """
+    
+    def __init__(self, openai_rpm: Optional[float] = None, openai_tpm: Optional[float] = None,
+                 anthropic_rpm: Optional[float] = None, anthropic_tpm: Optional[float] = None,
+                 cache_path: Optional[str] = None):
+        """
+        Args:
+            openai_rpm, openai_tpm: OpenAI requests/tokens per minute budget (None = unlimited)
+            anthropic_rpm, anthropic_tpm: Anthropic requests/tokens per minute budget (None = unlimited)
+            cache_path: SQLite file for caching successful analyses (None = no caching)
+        """
+        self.openai_client = None
+        self.anthropic_client = None
+        self._http = None
+        self._openai_clients = {}  # api_key -> AsyncOpenAI
+        self._anthropic_clients = {}  # api_key -> AsyncAnthropic
+        self.openai_limiter = RateLimiter(rpm=openai_rpm, tpm=openai_tpm)
+        self.anthropic_limiter = RateLimiter(rpm=anthropic_rpm, tpm=anthropic_tpm)
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self.response_cache = ResponseCache(cache_path) if cache_path else None
+        
+        # Built once at import and shared by every instance; treat as read-only
+        self.json_schema = JSON_SCHEMA
+        self.system_prompt = SYSTEM_PROMPT
+        self._schema_json = json.dumps(self.json_schema, sort_keys=True)  # Part of every cache key
+        
+        # Static parts of every request, built once; only the paper text varies per call
+        self._openai_system_message = {
+            "role": "developer",
+            "content": [
+                {
+                    "type": "text",
+                    "text": self.system_prompt
+                }
+            ]
+        }
+        self._openai_response_format = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "paper_review",
+                "strict": True,
+                "schema": self.json_schema
+            }
+        }
+        self._anthropic_tools = [
+            {
+                "name": "paper_review",
+                "description": "Review an academic article and make inclusion/exclusion decisions with detailed reasoning",
+                "input_schema": self.json_schema
+            }
+        ]
+        # Forcing the tool makes each paper a single round trip: Claude answers
+        # with the paper_review call directly, never a text-only reply to retry
+        self._anthropic_tool_choice = {"type": "tool", "name": "paper_review"}
+        self._openai_packed_response_format = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "paper_review",
+                "strict": True,
+                "schema": PACKED_JSON_SCHEMA
+            }
+        }
+        self._anthropic_packed_tools = [
+            {
+                "name": "paper_review",
+                "description": "Review several academic articles, making an inclusion/exclusion decision with detailed reasoning for each",
+                "input_schema": PACKED_JSON_SCHEMA
+            }
+        ]
+
     def initialize_clients(self, openai_api_key: Optional[str] = None, anthropic_api_key: Optional[str] = None):
-        """Initialize API clients with provided keys."""
+        """Initialize API clients with provided keys, sharing one HTTP connection pool.
+        
+        SDK clients are memoized per API key, so calling this again with the
+        same key reuses the existing client and its warm connections.
+        """
+        if (openai_api_key or anthropic_api_key) and self._http is None:
+            self._http = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        
         if openai_api_key:
             try:
-                self.openai_client = OpenAI(api_key=openai_api_key)
-                logger.info("OpenAI client initialized successfully")
+                if openai_api_key not in self._openai_clients:
+                    self._openai_clients[openai_api_key] = AsyncOpenAI(api_key=openai_api_key, http_client=self._http)
+                    logger.info("OpenAI client initialized successfully")
+                self.openai_client = self._openai_clients[openai_api_key]
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI client: {e}")
                 
         if anthropic_api_key:
             try:
-                self.anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
-                logger.info("Anthropic client initialized successfully")
+                if anthropic_api_key not in self._anthropic_clients:
+                    self._anthropic_clients[anthropic_api_key] = anthropic.AsyncAnthropic(api_key=anthropic_api_key, http_client=self._http)
+                    logger.info("Anthropic client initialized successfully")
+                self.anthropic_client = self._anthropic_clients[anthropic_api_key]
             except Exception as e:
                 logger.error(f"Failed to initialize Anthropic client: {e}")
     
+    def close(self):
+        """Close the shared HTTP connection pool and stop the background loop."""
+        if self._http is not None and self._loop is not None:
+            self._run(self._http.aclose())
+        self._http = None
+        self._openai_clients.clear()
+        self._anthropic_clients.clear()
+        self.openai_client = None
+        self.anthropic_client = None
+        
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+        
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the background event loop, starting it on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client-loop", daemon=True).start()
+            return self._loop
+    
+    def _run(self, coro):
+        """Run a coroutine on the background loop and block until it completes.
+        
+        Must not be called from the loop's own thread.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+    
+    def _openai_request_params(self, paper_text: str, packed: bool = False) -> Dict[str, Any]:
+        """Build the chat.completions request parameters for a paper (or packed papers)."""
+        return {
+            "model": "o3",
+            "messages": [
+                self._openai_system_message,
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": paper_text
+                        }
+                    ]
+                }
+            ],
+            "response_format": self._openai_packed_response_format if packed else self._openai_response_format,
+            "reasoning_effort": "high"
+        }
+    
+    def _anthropic_request_params(self, paper_text: str, packed: bool = False) -> Dict[str, Any]:
+        """Build the messages request parameters for a paper (or packed papers)."""
+        return {
+            "model": "claude-opus-4-20250514",
+            "max_tokens": 20000,  # Reduced to leave room for thinking tokens budget
+            "temperature": 1,
+            "system": self.system_prompt,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": paper_text
+                        }
+                    ]
+                }
+            ],
+            "tools": self._anthropic_packed_tools if packed else self._anthropic_tools,
+            "tool_choice": self._anthropic_tool_choice
+        }
+    
+    def _parse_anthropic_content(self, content) -> Optional[Dict[str, Any]]:
+        """Get the paper_review tool input from Anthropic message content, falling back to JSON text."""
+        if not content:
+            return None
+        
+        # Look for tool use in the response
+        for block in content:
+            if hasattr(block, 'type') and block.type == 'tool_use':
+                return block.input
+        
+        # If no tool use found, try to parse the text as (possibly malformed) JSON
+        text = "".join(block.text for block in content if getattr(block, 'type', None) == 'text')
+        return load_json_lenient(text) if text else None
+    
+    def _estimate_tokens(self, paper_text: str) -> int:
+        """Request size in tokens, including the system prompt."""
+        return count_tokens(self.system_prompt) + count_tokens(paper_text)
+    
+    async def _rate_limited(self, limiter: RateLimiter, estimated_tokens: int, request, rate_limit_error, filename: str):
+        """
+        Await request() once the limiter grants budget, retrying 429s.
+        
+        After a rate-limit error, back off with jittered exponential delay and
+        reserve budget again before retrying.
+        """
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await limiter.acquire(estimated_tokens)
+            try:
+                return await request()
+            except rate_limit_error:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning(f"Rate limited analyzing {filename}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
     def analyze_paper_openai(self, paper_text: str, filename: str) -> Tuple[Dict[str, Any], bool, Optional[str]]:
         """Analyze paper using OpenAI's API with structured output."""
+        return self._run(self.analyze_paper_openai_async(paper_text, filename))
+    
+    async def analyze_paper_openai_async(self, paper_text: str, filename: str, packed: bool = False) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+        """Analyze paper using OpenAI's API with structured output (packed: text holds several papers)."""
         if not self.openai_client:
             return {}, False, "OpenAI client not initialized"
         
+        request_params = self._openai_request_params(paper_text, packed)
+        estimated_tokens = self._estimate_tokens(paper_text)
+        
         try:
             logger.info(f"Analyzing {filename} with OpenAI O3")
             
-            response = self.openai_client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {
-                        "role": "developer",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self.system_prompt
-                            }
-                        ]
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": paper_text
-                            }
-                        ]
-                    }
-                ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "paper_review",
-                        "strict": True,
-                        "schema": self.json_schema
-                    }
-                },
-                reasoning_effort="high"
+            # A single non-streaming request: the structured output is only usable
+            # once complete, so streaming it would save nothing
+            response = await self._rate_limited(
+                self.openai_limiter,
+                estimated_tokens,
+                lambda: self.openai_client.chat.completions.create(**request_params),
+                openai.RateLimitError,
+                filename
             )
             
             # Parse the response
@@ -199,58 +465,44 @@ Always use the paper_review tool to submit your analysis."""
     
     def analyze_paper_anthropic(self, paper_text: str, filename: str) -> Tuple[Dict[str, Any], bool, Optional[str]]:
         """Analyze paper using Anthropic's API with structured output and streaming."""
+        return self._run(self.analyze_paper_anthropic_async(paper_text, filename))
+    
+    async def analyze_paper_anthropic_async(self, paper_text: str, filename: str, packed: bool = False) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+        """Analyze paper using Anthropic's API with structured output and streaming (packed: text holds several papers)."""
         if not self.anthropic_client:
             return {}, False, "Anthropic client not initialized"
         
+        request_params = self._anthropic_request_params(paper_text, packed)
+        estimated_tokens = self._estimate_tokens(paper_text)
+        
+        async def stream_result():
+            # Use streaming for long-running operations
+            async with self.anthropic_client.messages.stream(**request_params) as stream:
+                # Accumulate tool input JSON per content block and return as soon
+                # as the tool_use block closes, without waiting for message_stop
+                tool_input_parts = {}
+                async for event in stream:
+                    if event.type == "content_block_start" and event.content_block.type == "tool_use":
+                        tool_input_parts[event.index] = []
+                    elif event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                        tool_input_parts.setdefault(event.index, []).append(event.delta.partial_json)
+                    elif event.type == "content_block_stop" and event.index in tool_input_parts:
+                        return load_json_lenient("".join(tool_input_parts[event.index]) or "{}")
+                
+                # No tool use in the stream - parse the final message instead
+                message = await stream.get_final_message()
+                return self._parse_anthropic_content(message.content)
+        
         try:
             logger.info(f"Analyzing {filename} with Claude Opus 4 (streaming enabled)")
             
-            # Use streaming for long-running operations
-            with self.anthropic_client.messages.stream(
-                model="claude-opus-4-20250514",
-                max_tokens=20000,  # Reduced to leave room for thinking tokens budget
-                temperature=1,
-                system=self.system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": paper_text
-                            }
-                        ]
-                    }
-                ],
-                tools=[
-                    {
-                        "name": "paper_review",
-                        "description": "Review an academic article and make inclusion/exclusion decisions with detailed reasoning",
-                        "input_schema": self.json_schema
-                    }
-                ]
-            ) as stream:
-                # Get the final message from the stream
-                message = stream.get_final_message()
-            
             # Parse the response - Anthropic returns tool use in the content
-            content = message.content
-            if content and len(content) > 0:
-                # Look for tool use in the response
-                for block in content:
-                    if hasattr(block, 'type') and block.type == 'tool_use':
-                        result = block.input
-                        logger.info(f"Successfully analyzed {filename} with Anthropic (streaming)")
-                        return result, True, None
-                
-                # If no tool use found, try to parse as JSON
-                if hasattr(content[0], 'text'):
-                    try:
-                        result = json.loads(content[0].text)
-                        logger.info(f"Successfully analyzed {filename} with Anthropic (streaming fallback)")
-                        return result, True, None
-                    except json.JSONDecodeError:
-                        pass
+            result = await self._rate_limited(
+                self.anthropic_limiter, estimated_tokens, stream_result, anthropic.RateLimitError, filename
+            )
+            if result is not None:
+                logger.info(f"Successfully analyzed {filename} with Anthropic (streaming)")
+                return result, True, None
             
             error_msg = f"Unexpected response format from Anthropic for {filename}"
             logger.error(error_msg)
@@ -260,49 +512,19 @@ Always use the paper_review tool to submit your analysis."""
             # If streaming fails, try non-streaming as fallback
             logger.warning(f"Streaming failed for {filename}, trying non-streaming: {str(e)}")
             try:
-                message = self.anthropic_client.messages.create(
-                    model="claude-opus-4-20250514",
-                    max_tokens=20000,  # Reduced to leave room for thinking tokens budget
-                    temperature=1,
-                    system=self.system_prompt,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": paper_text
-                                }
-                            ]
-                        }
-                    ],
-                    tools=[
-                        {
-                            "name": "paper_review",
-                            "description": "Review an academic article and make inclusion/exclusion decisions with detailed reasoning",
-                            "input_schema": self.json_schema
-                        }
-                    ]
+                message = await self._rate_limited(
+                    self.anthropic_limiter,
+                    estimated_tokens,
+                    lambda: self.anthropic_client.messages.create(**request_params),
+                    anthropic.RateLimitError,
+                    filename
                 )
                 
                 # Parse the response
-                content = message.content
-                if content and len(content) > 0:
-                    # Look for tool use in the response
-                    for block in content:
-                        if hasattr(block, 'type') and block.type == 'tool_use':
-                            result = block.input
-                            logger.info(f"Successfully analyzed {filename} with Anthropic (non-streaming fallback)")
-                            return result, True, None
-                    
-                    # If no tool use found, try to parse as JSON
-                    if hasattr(content[0], 'text'):
-                        try:
-                            result = json.loads(content[0].text)
-                            logger.info(f"Successfully analyzed {filename} with Anthropic (non-streaming JSON fallback)")
-                            return result, True, None
-                        except json.JSONDecodeError:
-                            pass
+                result = self._parse_anthropic_content(message.content)
+                if result is not None:
+                    logger.info(f"Successfully analyzed {filename} with Anthropic (non-streaming fallback)")
+                    return result, True, None
                 
                 error_msg = f"Unexpected response format from Anthropic for {filename} (both streaming and non-streaming failed)"
                 logger.error(error_msg)
@@ -315,8 +537,12 @@ Always use the paper_review tool to submit your analysis."""
     
     def analyze_paper(self, paper_text: str, filename: str, model: str) -> Tuple[Dict[str, Any], bool, Optional[str]]:
         """Analyze paper using the specified model."""
-        # Check if text is too long (rough token estimation: 1 token ≈ 4 characters)
-        estimated_tokens = len(paper_text) // 4
+        return self._run(self.analyze_paper_async(paper_text, filename, model))
+    
+    async def analyze_paper_async(self, paper_text: str, filename: str, model: str) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+        """Analyze paper using the specified model."""
+        # Check if text is too long
+        estimated_tokens = count_tokens(paper_text)
         
         # Enhanced warnings for different document sizes
         if estimated_tokens > 180000:
@@ -333,31 +559,339 @@ Always use the paper_review tool to submit your analysis."""
         if "claude" in model.lower() and estimated_tokens > 100000:
             logger.info(f"Using streaming for large document processing: {filename}")
         
+        analyze = self._analyze_function(model)
+        if analyze is None:
+            return {}, False, f"Unsupported model: {model}"
+        
+        # Identical model, prompt, schema and text: reuse the earlier analysis
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self._cache_key(model, paper_text)
+            cached_result = self.response_cache.get(cache_key)
+            if cached_result is not None:
+                logger.info(f"Using cached {model} analysis for {filename}")
+                return cached_result, True, None
+        
+        result, success, error_msg = await analyze(paper_text, filename)
+        # Only reviews that pass validation are cached, so a bad one is retried next time
+        if success and cache_key is not None and self.validate_result(result)[0]:
+            self.response_cache.set(cache_key, result)
+        return result, success, error_msg
+    
+    def _analyze_function(self, model: str):
+        """The provider-specific analyze coroutine function for a model name, or None if unsupported."""
         if "o3" in model.lower():
-            return self.analyze_paper_openai(paper_text, filename)
+            return self.analyze_paper_openai_async
         elif "claude" in model.lower():
-            return self.analyze_paper_anthropic(paper_text, filename)
-        else:
-            return {}, False, f"Unsupported model: {model}"
+            return self.analyze_paper_anthropic_async
+        return None
+    
+    def _cache_key(self, model: str, paper_text: str) -> str:
+        """Response cache key for one paper analyzed by a model."""
+        return ResponseCache.make_key(model, self.system_prompt, self._schema_json, paper_text)
+    
+    def analyze_packed(self, jobs: List[Tuple[str, str]], model: str) -> List[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """Analyze several short papers in one request; see analyze_packed_async."""
+        return self._run(self.analyze_packed_async(jobs, model))
+    
+    async def analyze_packed_async(self, jobs: List[Tuple[str, str]], model: str) -> List[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """
+        Analyze several short papers with a single request returning one review per paper.
+        
+        Papers are delimited in one user message and the structured output is
+        an array of reviews in the same order. Cached papers are not re-sent.
+        If the request fails or the number of reviews does not match, every
+        uncached paper is analyzed on its own instead; so is any paper whose
+        review fails validation. Packed reviews are not cached.
+        
+        Args:
+            jobs: List of (paper_text, filename) pairs
+            model: Model name, as accepted by analyze_paper
+            
+        Returns:
+            List of (result, success_flag, error_message) tuples, in job order
+        """
+        analyze = self._analyze_function(model)
+        if analyze is None:
+            return [({}, False, f"Unsupported model: {model}")] * len(jobs)
+        
+        results = [None] * len(jobs)
+        pending = []
+        for index, (paper_text, filename) in enumerate(jobs):
+            if self.response_cache is not None:
+                cached_result = self.response_cache.get(self._cache_key(model, paper_text))
+                if cached_result is not None:
+                    logger.info(f"Using cached {model} analysis for {filename}")
+                    results[index] = (cached_result, True, None)
+                    continue
+            pending.append(index)
+        
+        if len(pending) > 1:
+            filenames = ", ".join(jobs[index][1] for index in pending)
+            packed_text = "\n\n".join(
+                [f"The following {len(pending)} papers are separate submissions. Review each one independently "
+                 f"and return exactly one review per paper in `reviews`, in the order given."]
+                + [f"<<<PAPER_{number}>>>\n{jobs[index][0]}" for number, index in enumerate(pending, 1)]
+            )
+            result, success, error_msg = await analyze(packed_text, filenames, packed=True)
+            reviews = result.get("reviews") if success and isinstance(result, dict) else None
+            
+            if isinstance(reviews, list) and len(reviews) == len(pending):
+                # Keep the reviews that validate; papers with an invalid review are
+                # analyzed on their own. Packed reviews come from a different prompt,
+                # so they are not written to the single-paper response cache
+                retry = []
+                for index, review in zip(pending, reviews):
+                    if self.validate_result(review)[0]:
+                        results[index] = (review, True, None)
+                    else:
+                        retry.append(index)
+                if retry:
+                    logger.warning(f"Packed analysis returned {len(retry)} invalid review(s) for {filenames}, analyzing those separately")
+                pending = retry
+            else:
+                logger.warning(f"Packed analysis of {filenames} failed ({error_msg or 'unexpected reviews'}), analyzing separately")
+        
+        separate = await asyncio.gather(*(self.analyze_paper_async(*jobs[index], model) for index in pending))
+        for index, result in zip(pending, separate):
+            results[index] = result
+        return results
+    
+    def analyze_many(self, jobs: List[Tuple[str, str]], model: str, max_concurrency: int = 20,
+                     pack_size: int = 1) -> List[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """Analyze many papers concurrently; see analyze_many_async."""
+        return self._run(self.analyze_many_async(jobs, model, max_concurrency, pack_size))
+    
+    async def analyze_many_async(self, jobs: List[Tuple[str, str]], model: str, max_concurrency: int = 20,
+                                 pack_size: int = 1) -> List[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """
+        Analyze many papers concurrently with the specified model.
+        
+        Args:
+            jobs: List of (paper_text, filename) pairs
+            model: Model name, as accepted by analyze_paper
+            max_concurrency: Maximum number of requests in flight at once
+            pack_size: Up to this many short papers share one request (1 = one request per paper)
+            
+        Returns:
+            List of (result, success_flag, error_message) tuples, in job order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze_group(indices: List[int]):
+            async with semaphore:
+                if len(indices) == 1:
+                    return [await self.analyze_paper_async(*jobs[indices[0]], model)]
+                return await self.analyze_packed_async([jobs[index] for index in indices], model)
+        
+        groups = self._pack_groups(jobs, pack_size)
+        results = [None] * len(jobs)
+        for indices, group_results in zip(groups, await asyncio.gather(*(analyze_group(indices) for indices in groups))):
+            for index, result in zip(indices, group_results):
+                results[index] = result
+        return results
+    
+    def _pack_groups(self, jobs: List[Tuple[str, str]], pack_size: int) -> List[List[int]]:
+        """Group job indices for analysis: short papers in packs of up to pack_size, others alone."""
+        groups = []
+        pack, pack_tokens = [], 0
+        for index, (paper_text, _) in enumerate(jobs):
+            tokens = count_tokens(paper_text)
+            if pack_size <= 1 or tokens > PACKED_PAPER_MAX_TOKENS:
+                groups.append([index])
+                continue
+            
+            if len(pack) == pack_size or pack_tokens + tokens > PACKED_REQUEST_MAX_TOKENS:
+                groups.append(pack)
+                pack, pack_tokens = [], 0
+            pack.append(index)
+            pack_tokens += tokens
+        
+        if pack:
+            groups.append(pack)
+        return groups
+    
+    def analyze_paper_batch_submit(self, jobs: List[Tuple[str, str]], model: str) -> Tuple[Optional[str], Optional[str]]:
+        """Submit papers to the provider's Batch API; see analyze_paper_batch_submit_async."""
+        return self._run(self.analyze_paper_batch_submit_async(jobs, model))
+    
+    async def analyze_paper_batch_submit_async(self, jobs: List[Tuple[str, str]], model: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Submit papers to the OpenAI or Anthropic Batch API for offline processing.
+        
+        Batches cost about half as much as interactive requests but may take up
+        to 24 hours; use poll_and_collect to wait for and parse the results.
+        
+        Args:
+            jobs: List of (paper_text, filename) pairs
+            model: Model name, as accepted by analyze_paper
+            
+        Returns:
+            Tuple of (batch_id, error_message)
+        """
+        try:
+            if "o3" in model.lower():
+                if not self.openai_client:
+                    return None, "OpenAI client not initialized"
+                
+                # One JSONL line per paper, reusing the interactive request body
+                lines = [
+                    json.dumps({
+                        "custom_id": self._batch_custom_id(index),
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": self._openai_request_params(paper_text)
+                    })
+                    for index, (paper_text, _) in enumerate(jobs)
+                ]
+                batch_file = await self.openai_client.files.create(
+                    file=("paper_review_batch.jsonl", "\n".join(lines).encode("utf-8")),
+                    purpose="batch"
+                )
+                batch = await self.openai_client.batches.create(
+                    input_file_id=batch_file.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h"
+                )
+            elif "claude" in model.lower():
+                if not self.anthropic_client:
+                    return None, "Anthropic client not initialized"
+                
+                batch = await self.anthropic_client.messages.batches.create(
+                    requests=[
+                        {
+                            "custom_id": self._batch_custom_id(index),
+                            "params": self._anthropic_request_params(paper_text)
+                        }
+                        for index, (paper_text, _) in enumerate(jobs)
+                    ]
+                )
+            else:
+                return None, f"Unsupported model: {model}"
+            
+            logger.info(f"Submitted batch {batch.id} with {len(jobs)} papers to {model}")
+            return batch.id, None
+            
+        except Exception as e:
+            error_msg = f"Batch submission error for {model}: {str(e)}"
+            logger.error(error_msg)
+            return None, error_msg
+    
+    def poll_and_collect(self, batch_id: str, model: str, poll_interval: float = 60.0) -> Dict[int, Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """Wait for a submitted batch and collect its results; see poll_and_collect_async."""
+        return self._run(self.poll_and_collect_async(batch_id, model, poll_interval))
+    
+    async def poll_and_collect_async(self, batch_id: str, model: str, poll_interval: float = 60.0) -> Dict[int, Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """
+        Poll a batch submitted with analyze_paper_batch_submit until it ends and parse its results.
+        
+        Args:
+            batch_id: ID returned by analyze_paper_batch_submit
+            model: Model name the batch was submitted with
+            poll_interval: Seconds between status checks
+            
+        Returns:
+            Dict mapping each job's index in the submitted list to a
+            (result, success_flag, error_message) tuple; jobs the provider
+            never processed (e.g. an expired batch) are absent
+        """
+        if "o3" in model.lower():
+            if not self.openai_client:
+                raise ValueError("OpenAI client not initialized")
+            return await self._collect_openai_batch(batch_id, poll_interval)
+        elif "claude" in model.lower():
+            if not self.anthropic_client:
+                raise ValueError("Anthropic client not initialized")
+            return await self._collect_anthropic_batch(batch_id, poll_interval)
+        raise ValueError(f"Unsupported model: {model}")
+    
+    async def _collect_openai_batch(self, batch_id: str, poll_interval: float) -> Dict[int, Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """Poll an OpenAI batch and parse its output and error files."""
+        while True:
+            batch = await self.openai_client.batches.retrieve(batch_id)
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            await asyncio.sleep(poll_interval)
+        
+        logger.info(f"OpenAI batch {batch_id} ended with status {batch.status}")
+        results = {}
+        
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            
+            file_content = await self.openai_client.files.content(file_id)
+            for line in file_content.text.splitlines():
+                if not line.strip():
+                    continue
+                
+                item = json.loads(line)
+                index = self._batch_index(item["custom_id"])
+                response = item.get("response") or {}
+                
+                if item.get("error") or response.get("status_code") != 200:
+                    error = item.get("error") or response.get("body")
+                    results[index] = ({}, False, f"OpenAI batch request failed: {error}")
+                    continue
+                
+                try:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    results[index] = (json.loads(content), True, None)
+                except Exception as e:
+                    results[index] = ({}, False, f"Unexpected response format from OpenAI batch: {str(e)}")
+        
+        if batch.status != "completed" and not results:
+            raise RuntimeError(f"OpenAI batch {batch_id} ended with status {batch.status}")
+        
+        return results
+    
+    async def _collect_anthropic_batch(self, batch_id: str, poll_interval: float) -> Dict[int, Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """Poll an Anthropic message batch and parse its results."""
+        while True:
+            batch = await self.anthropic_client.messages.batches.retrieve(batch_id)
+            if batch.processing_status == "ended":
+                break
+            await asyncio.sleep(poll_interval)
+        
+        logger.info(f"Anthropic batch {batch_id} ended")
+        results = {}
+        
+        async for entry in await self.anthropic_client.messages.batches.results(batch_id):
+            index = self._batch_index(entry.custom_id)
+            
+            if entry.result.type != "succeeded":
+                results[index] = ({}, False, f"Anthropic batch request {entry.result.type}")
+                continue
+            
+            result = self._parse_anthropic_content(entry.result.message.content)
+            if result is not None:
+                results[index] = (result, True, None)
+            else:
+                results[index] = ({}, False, "Unexpected response format from Anthropic batch")
+        
+        return results
+    
+    def _batch_custom_id(self, index: int) -> str:
+        """Batch request ID for a job; filenames are not valid Anthropic custom_ids."""
+        return f"paper-{index}"
+    
+    def _batch_index(self, custom_id: str) -> int:
+        """Job index encoded by _batch_custom_id."""
+        return int(custom_id.rsplit("-", 1)[1])
     
     def validate_result(self, result: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
         """Validate the structured output against our schema."""
         try:
-            # Check required fields
-            required_fields = ["article_title", "inclusion_decision", "justification", "category", "detailed_reasoning"]
-            for field in required_fields:
-                if field not in result:
-                    return False, f"Missing required field: {field}"
-                if not result[field] or (isinstance(result[field], str) and not result[field].strip()):
-                    return False, f"Empty required field: {field}"
-            
-            # Check enum values
-            if result["inclusion_decision"] not in ["Included", "Excluded"]:
-                return False, f"Invalid inclusion_decision: {result['inclusion_decision']}"
+            # Check required fields, types, enum values and unexpected fields
+            try:
+                SCHEMA_VALIDATOR(result)
+            except fastjsonschema.JsonSchemaException as e:
+                return False, f"Schema violation: {e.message}"
             
-            valid_categories = ["Client", "FLW", "Feasibility", "Data", "Grey Literature", "N/A"]
-            if result["category"] not in valid_categories:
-                return False, f"Invalid category: {result['category']}"
+            # The schema allows empty strings; the review does not
+            for field in self.json_schema["required"]:
+                if not result[field].strip():
+                    return False, f"Empty required field: {field}"
             
             # Logic validation: excluded papers should have N/A category
             if result["inclusion_decision"] == "Excluded" and result["category"] != "N/A":
@@ -1,20 +1,103 @@
 import pdfplumber
+import pypdfium2 as pdfium
 import pytesseract
 from PIL import Image
+import atexit
 import io
+import os
 import re
+import hashlib
 import logging
-from typing import Tuple, Optional
+import multiprocessing
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Tuple, Optional
+
+try:
+    # Optional: in-process Tesseract bindings, avoiding a subprocess per page
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Text cleanup patterns, compiled once rather than looked up on every call
+WHITESPACE_RE = re.compile(r'\s+')
+EXCESS_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+
+# ASCII control characters, deleted with str.translate once non-ASCII text has been dropped
+ASCII_CONTROL_TABLE = dict.fromkeys([*range(0x20), 0x7F])
+
+# PDFium is not thread-safe, even across separate documents, so every in-process
+# call into it is serialized; worker processes each have their own copy
+PDFIUM_LOCK = threading.Lock()
+
+def _pdfium_page_text(pdf, index: int) -> str:
+    """Native text of one page of an open pypdfium2 document, via PDFium's own text extractor."""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_bounded()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+def _extract_page_range_text(pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Worker-process entry point: native text of pages [start, stop) ("" where a page has none)."""
+    page_texts = []
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        for index in range(start, stop):
+            try:
+                page_texts.append(_pdfium_page_text(pdf, index))
+            except Exception:
+                page_texts.append("")
+    finally:
+        pdf.close()
+    return page_texts
+
 class PDFProcessor:
     """Enhanced PDF text extraction with OCR fallback and error handling."""
     
-    def __init__(self):
+    def __init__(self, ocr_dpi: int = 200):
+        """
+        Args:
+            ocr_dpi: Resolution pages are rendered at for OCR
+        """
         self.ocr_threshold = 50  # Minimum characters to consider text extraction successful
+        self.page_ocr_threshold = 50  # Pages with fewer native characters are OCR'd
+        self.ocr_dpi = ocr_dpi
+        self.ocr_oem = 1  # Tesseract engine mode: LSTM only
+        self.ocr_psm = 1  # Tesseract page segmentation: automatic, with orientation and script detection
+        self.ocr_workers = min(4, os.cpu_count() or 1)  # Parallel Tesseract processes per PDF
+        self.page_workers = min(4, os.cpu_count() or 1)  # Processes for native extraction of large PDFs
+        self.parallel_page_threshold = 32  # Minimum page count before extraction is split across processes
+        self._page_pool = None
+        self._page_pool_lock = threading.Lock()
+        self._ocr_pool = None
+        self._ocr_pool_lock = threading.Lock()
+        self._tesseract = threading.local()  # One tesserocr engine per OCR thread
+        self.text_cache_size = 128  # Number of extracted texts kept, keyed by PDF content hash
+        self._text_cache = OrderedDict()
+        self._text_cache_lock = threading.Lock()
+        # The pools outlive any one extraction; shut them down with the process
+        atexit.register(self.close)
+    
+    def close(self):
+        """Shut down the page-extraction process pool and the OCR thread pool, if started."""
+        with self._page_pool_lock:
+            if self._page_pool is not None:
+                self._page_pool.shutdown(wait=False, cancel_futures=True)
+                self._page_pool = None
+        with self._ocr_pool_lock:
+            if self._ocr_pool is not None:
+                self._ocr_pool.shutdown(wait=False, cancel_futures=True)
+                self._ocr_pool = None
     
     def extract_text_from_pdf(self, pdf_file_obj, filename: str) -> Tuple[str, bool, Optional[str]]:
         """
@@ -28,96 +111,288 @@ class PDFProcessor:
             Tuple of (extracted_text, success_flag, error_message)
         """
         try:
-            # First, try native text extraction with pdfplumber
-            text = self._extract_native_text(pdf_file_obj, filename)
-            
-            if self._is_text_sufficient(text):
-                logger.info(f"Successfully extracted native text from {filename}")
-                cleaned_text = self._clean_text(text)
-                return cleaned_text, True, None
-            else:
-                # Text layer missing or insufficient, try OCR
-                logger.info(f"Native text insufficient for {filename}, attempting OCR")
-                ocr_text = self._extract_ocr_text(pdf_file_obj, filename)
-                
-                if ocr_text:
-                    cleaned_text = self._clean_text(ocr_text)
-                    return cleaned_text, True, None
-                else:
-                    error_msg = f"Both native and OCR text extraction failed for {filename}"
-                    logger.error(error_msg)
-                    return "", False, error_msg
-                    
+            with PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(pdf_file_obj)
         except Exception as e:
             error_msg = f"Error processing {filename}: {str(e)}"
             logger.error(error_msg)
             return "", False, error_msg
+        
+        try:
+            text, error_msg = self._extract_from_pdf(pdf, pdf_file_obj, filename)
+        finally:
+            with PDFIUM_LOCK:
+                pdf.close()
+        
+        return text, error_msg is None, error_msg
     
-    def _extract_native_text(self, pdf_file_obj, filename: str) -> str:
-        """Extract text using pdfplumber (native text layer)."""
+    def extract_text_cached(self, pdf_file_obj, filename: str) -> Tuple[str, Optional[str]]:
+        """
+        Same as extract_text_or_error, memoized on a hash of the PDF's bytes.
+        
+        Re-uploaded or duplicate PDFs skip extraction (and OCR) entirely. Only
+        successful extractions are cached. Safe to call from multiple threads.
+        
+        Returns:
+            Tuple of (extracted_text, error_message); error_message is None on success
+        """
         try:
-            # Reset file pointer
-            pdf_file_obj.seek(0)
+            cache_key = self._content_hash(pdf_file_obj)
+        except Exception as e:
+            logger.warning(f"Could not hash {filename}, extracting without cache: {e}")
+            return self.extract_text_or_error(pdf_file_obj, filename)
+        
+        with self._text_cache_lock:
+            cached_text = self._text_cache.get(cache_key)
+            if cached_text is not None:
+                self._text_cache.move_to_end(cache_key)
+        if cached_text is not None:
+            logger.info(f"Using cached text for {filename}")
+            return cached_text, None
+        
+        text, error_msg = self.extract_text_or_error(pdf_file_obj, filename)
+        
+        if not error_msg:
+            with self._text_cache_lock:
+                self._text_cache[cache_key] = text
+                while len(self._text_cache) > self.text_cache_size:
+                    self._text_cache.popitem(last=False)
+        
+        return text, error_msg
+    
+    def _content_hash(self, pdf_file_obj) -> str:
+        """Hash the PDF's bytes, without copying them when the object is a BytesIO."""
+        if hasattr(pdf_file_obj, 'getbuffer'):
+            with pdf_file_obj.getbuffer() as view:
+                return hashlib.blake2b(view, digest_size=16).hexdigest()
+        
+        pdf_file_obj.seek(0)
+        return hashlib.blake2b(pdf_file_obj.read(), digest_size=16).hexdigest()
+    
+    def _pdf_bytes(self, pdf_file_obj) -> bytes:
+        """The PDF's bytes, for handing to worker processes."""
+        if hasattr(pdf_file_obj, 'getvalue'):
+            return pdf_file_obj.getvalue()
+        
+        pdf_file_obj.seek(0)
+        return pdf_file_obj.read()
+    
+    def extract_text_or_error(self, pdf_file_obj, filename: str) -> Tuple[str, Optional[str]]:
+        """
+        Check readability and extract text (with OCR fallback) in a single pass.
+        
+        Opens the PDF once, instead of once in is_pdf_readable and again in
+        extract_text_from_pdf.
+        
+        Args:
+            pdf_file_obj: File object containing PDF data
+            filename: Name of the PDF file for logging
             
-            with pdfplumber.open(pdf_file_obj) as pdf:
-                text_parts = []
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(page_text)
-                    except Exception as e:
-                        logger.warning(f"Error extracting text from page {page_num + 1} of {filename}: {e}")
-                        continue
-                
-                return "\n".join(text_parts)
-                
+        Returns:
+            Tuple of (extracted_text, error_message); error_message is None on success
+        """
+        try:
+            # PDFium reads from the file object on demand, so the upload is never copied
+            with PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(pdf_file_obj)
         except Exception as e:
-            logger.error(f"Native text extraction failed for {filename}: {e}")
-            return ""
+            return "", f"PDF {filename} is not readable: {str(e)}"
+        
+        try:
+            try:
+                with PDFIUM_LOCK:
+                    if len(pdf) == 0:
+                        return "", f"PDF {filename} has no pages"
+                    
+                    # Try to load the first page to check for encryption/corruption
+                    pdf[0].close()
+            except Exception as e:
+                return "", f"PDF {filename} is not readable: {str(e)}"
+            
+            text, error_msg = self._extract_from_pdf(pdf, pdf_file_obj, filename)
+            if error_msg:
+                return "", f"Text extraction failed: {error_msg}"
+            return text, None
+        finally:
+            with PDFIUM_LOCK:
+                pdf.close()
     
-    def _extract_ocr_text(self, pdf_file_obj, filename: str) -> str:
-        """Extract text using OCR (for scanned PDFs)."""
+    def _extract_from_pdf(self, pdf, pdf_file_obj, filename: str) -> Tuple[str, Optional[str]]:
+        """
+        Extract text from an already-opened pypdfium2 document, OCR'ing only pages without a usable text layer.
+        
+        The document is parsed once: the native text of every page is read
+        first, then each page below page_ocr_threshold (scanned pages of an
+        otherwise digital PDF included) is rendered and OCR'd from the same
+        open document.
+        
+        Returns:
+            Tuple of (cleaned_text, error_message); error_message is None on success
+        """
         try:
-            # Reset file pointer
-            pdf_file_obj.seek(0)
+            # Fast path: the digital text layer, no rasterization
+            with PDFIUM_LOCK:
+                page_count = len(pdf)
+            page_texts = None
+            if self.page_workers > 1 and page_count >= self.parallel_page_threshold:
+                page_texts = self._native_page_texts_parallel(self._pdf_bytes(pdf_file_obj), page_count, filename)
+            if page_texts is None:
+                page_texts = self._native_page_texts(pdf, page_count, filename)
+            
+            # OCR only the pages lacking a text layer, keeping native text where OCR finds nothing
+            thin_pages = [
+                i for i, page_text in enumerate(page_texts)
+                if not self._is_text_sufficient(page_text, self.page_ocr_threshold)
+            ]
+            ocr_succeeded = False
+            if thin_pages:
+                logger.info(f"Attempting OCR on {len(thin_pages)} of {page_count} page(s) of {filename}")
+                ocr_texts = self._ocr_page_texts(pdf, thin_pages, filename)
+                for i, ocr_text in zip(thin_pages, ocr_texts):
+                    if ocr_text.strip():
+                        page_texts[i] = ocr_text
+                        ocr_succeeded = True
+            
+            # Any OCR'd text counts, as a scan's recognizable text may be short
+            text = "\n".join(page_text for page_text in page_texts if page_text)
+            if ocr_succeeded or self._is_text_sufficient(text):
+                logger.info(f"Successfully extracted text from {filename}")
+                return self._clean_text(text), None
+            
+            error_msg = f"Both native and OCR text extraction failed for {filename}"
+            logger.error(error_msg)
+            return "", error_msg
             
-            with pdfplumber.open(pdf_file_obj) as pdf:
-                ocr_text_parts = []
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        # Convert page to image
-                        page_image = page.to_image(resolution=300)
-                        
-                        # Convert to PIL Image for pytesseract
-                        pil_image = page_image.original
-                        
-                        # Perform OCR
-                        page_text = pytesseract.image_to_string(pil_image, lang='eng')
-                        
-                        if page_text.strip():
-                            ocr_text_parts.append(page_text)
-                            
-                    except Exception as e:
-                        logger.warning(f"OCR failed for page {page_num + 1} of {filename}: {e}")
-                        continue
-                
-                return "\n".join(ocr_text_parts)
-                
         except Exception as e:
-            logger.error(f"OCR text extraction failed for {filename}: {e}")
-            return ""
+            error_msg = f"Error processing {filename}: {str(e)}"
+            logger.error(error_msg)
+            return "", error_msg
+    
+    def _native_page_texts(self, pdf, page_count: int, filename: str) -> List[str]:
+        """
+        Extract the native text layer of each page ("" where a page has none).
+        
+        Each page is closed as soon as its text is read, so memory stays flat
+        instead of growing with the page count. The PDFium lock is taken per
+        page so concurrent extractions interleave.
+        """
+        page_texts = []
+        
+        for index in range(page_count):
+            try:
+                with PDFIUM_LOCK:
+                    page_texts.append(_pdfium_page_text(pdf, index))
+            except Exception as e:
+                logger.warning(f"Error extracting text from page {index + 1} of {filename}: {e}")
+                page_texts.append("")
+        
+        return page_texts
+    
+    def _native_page_texts_parallel(self, pdf_bytes: bytes, page_count: int, filename: str) -> Optional[List[str]]:
+        """
+        Extract the native text of each page, splitting the pages across worker processes.
+        
+        PDFium can only be used from one thread per process, so threads do not
+        help; each worker reopens the PDF from its bytes and handles one
+        contiguous page range. Returns None if the pool fails, so the caller can
+        fall back to sequential extraction.
+        """
+        try:
+            chunk_size = -(-page_count // self.page_workers)  # ceiling division
+            ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+            
+            pool = self._get_page_pool()
+            futures = [pool.submit(_extract_page_range_text, pdf_bytes, start, stop) for start, stop in ranges]
+            
+            page_texts = []
+            for future in futures:
+                page_texts.extend(future.result())
+            return page_texts
+            
+        except Exception as e:
+            logger.warning(f"Parallel text extraction failed for {filename}, falling back to sequential: {e}")
+            return None
+    
+    def _get_page_pool(self) -> ProcessPoolExecutor:
+        """Get the page-extraction process pool, starting it on first use."""
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                # spawn rather than fork: forking a multi-threaded server process is unsafe
+                self._page_pool = ProcessPoolExecutor(
+                    max_workers=self.page_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._page_pool
+    
+    def _ocr_page_texts(self, pdf, page_indices: List[int], filename: str) -> List[str]:
+        """
+        OCR the given pages of an open pypdfium2 document ("" where OCR fails).
+        
+        Pages are rendered one at a time under the PDFium lock while Tesseract
+        runs on up to ocr_workers pages in parallel on a shared, long-lived
+        thread pool. At most 2 * ocr_workers rendered images are held in
+        memory at once.
+        """
+        ocr_texts = [""] * len(page_indices)
+        in_flight = deque()
+        
+        def collect(index, future):
+            try:
+                ocr_texts[index] = future.result()
+            except Exception as e:
+                logger.warning(f"OCR failed for page {page_indices[index] + 1} of {filename}: {e}")
+        
+        executor = self._get_ocr_pool()
+        for index, page_index in enumerate(page_indices):
+            if len(in_flight) >= 2 * self.ocr_workers:
+                collect(*in_flight.popleft())
+            
+            try:
+                # Grayscale at ocr_dpi: under half the pixels of 300 DPI, one byte each instead of three
+                with PDFIUM_LOCK:
+                    page = pdf[page_index]
+                    try:
+                        pil_image = page.render(scale=self.ocr_dpi / 72, grayscale=True).to_pil()
+                    finally:
+                        page.close()
+            except Exception as e:
+                logger.warning(f"OCR failed for page {page_index + 1} of {filename}: {e}")
+                continue
+            
+            in_flight.append((index, executor.submit(self._ocr_image, pil_image)))
+        
+        while in_flight:
+            collect(*in_flight.popleft())
+        
+        return ocr_texts
+    
+    def _ocr_image(self, pil_image) -> str:
+        """OCR one image, in-process with tesserocr when installed, else via the tesseract binary."""
+        if tesserocr is None:
+            return pytesseract.image_to_string(pil_image, lang='eng', config=f'--oem {self.ocr_oem} --psm {self.ocr_psm}')
+        
+        # Engines are not thread-safe, so each OCR thread keeps its own loaded engine
+        api = getattr(self._tesseract, 'api', None)
+        if api is None:
+            api = self._tesseract.api = tesserocr.PyTessBaseAPI(lang='eng', psm=self.ocr_psm, oem=self.ocr_oem)
+        api.SetImage(pil_image)
+        return api.GetUTF8Text()
+    
+    def _get_ocr_pool(self) -> ThreadPoolExecutor:
+        """Get the OCR thread pool, starting it on first use."""
+        with self._ocr_pool_lock:
+            if self._ocr_pool is None:
+                self._ocr_pool = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="ocr")
+            return self._ocr_pool
     
-    def _is_text_sufficient(self, text: str) -> bool:
+    def _is_text_sufficient(self, text: str, threshold: Optional[int] = None) -> bool:
         """Check if extracted text is sufficient (not just whitespace/minimal content)."""
         if not text:
             return False
         
         # Remove whitespace and count meaningful characters
-        cleaned = re.sub(r'\s+', '', text)
-        return len(cleaned) >= self.ocr_threshold
+        cleaned = WHITESPACE_RE.sub('', text)
+        return len(cleaned) >= (self.ocr_threshold if threshold is None else threshold)
     
     def _clean_text(self, text: str) -> str:
         """Clean and sanitize extracted text."""
@@ -125,17 +400,17 @@ class PDFProcessor:
             return ""
         
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE_RE.sub(' ', text)
         
         # Remove excessive line breaks
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+        text = EXCESS_BLANK_LINES_RE.sub('\n\n', text)
         
         # Remove leading/trailing whitespace
         text = text.strip()
         
         # Remove common PDF artifacts
-        text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)  # Remove control characters
-        text = re.sub(r'[^\x20-\x7E\n\r\t]', '', text)    # Keep only printable ASCII + newlines/tabs
+        # Keep only printable ASCII: drop everything else in two C-level passes
+        text = text.encode('ascii', 'ignore').decode('ascii').translate(ASCII_CONTROL_TABLE)
         
         return text
     
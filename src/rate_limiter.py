@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Optional
+
+class RateLimiter:
+    """Async token-bucket limiter for requests per minute (RPM) and tokens per minute (TPM)."""
+    
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """
+        Args:
+            rpm: Maximum requests per minute, or None for no request limit
+            tpm: Maximum tokens per minute, or None for no token limit
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        
+        # Buckets start full and refill continuously at their per-minute rate
+        self._request_capacity = max(rpm, 1.0) if rpm else 0.0
+        self._available_requests = self._request_capacity
+        self._available_tokens = tpm or 0.0
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured."""
+        return bool(self.rpm or self.tpm)
+    
+    async def acquire(self, tokens: int = 0):
+        """
+        Wait until one request and the given number of tokens are available, then consume them.
+        
+        Waiters are served in arrival order. A request estimated at more tokens
+        than the whole per-minute budget waits for a full bucket instead of
+        blocking forever.
+        """
+        if not self.enabled:
+            return
+        
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        
+        async with self._lock:
+            while True:
+                self._refill()
+                
+                request_wait = 0.0
+                if self.rpm and self._available_requests < 1:
+                    request_wait = (1 - self._available_requests) * 60.0 / self.rpm
+                
+                token_wait = 0.0
+                if self.tpm and self._available_tokens < tokens:
+                    token_wait = (tokens - self._available_tokens) * 60.0 / self.tpm
+                
+                if request_wait == 0.0 and token_wait == 0.0:
+                    if self.rpm:
+                        self._available_requests -= 1
+                    if self.tpm:
+                        self._available_tokens -= tokens
+                    return
+                
+                await asyncio.sleep(max(request_wait, token_wait))
+    
+    def _refill(self):
+        """Top up both buckets for the time elapsed since the last refill."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        
+        if self.rpm:
+            self._available_requests = min(self._request_capacity, self._available_requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._available_tokens = min(self.tpm, self._available_tokens + elapsed * self.tpm / 60.0)
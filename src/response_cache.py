@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Persistent cache of LLM analysis results in a SQLite file, keyed by a content hash."""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file; its directory is created if needed
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """SHA-256 of the given strings, separated so that part boundaries matter."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None if absent or unreadable."""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT result FROM responses WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning(f"Could not read LLM response cache: {e}")
+            return None
+    
+    def set(self, key: str, result: Dict[str, Any]):
+        """Store result under key, replacing any previous entry."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, result, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), datetime.now().isoformat())
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not write LLM response cache: {e}")
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
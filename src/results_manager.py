@@ -1,19 +1,68 @@
 import csv
+import io
 import json
 import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from itertools import count, islice
+from operator import itemgetter
+from typing import List, Dict, Any, Iterator, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Output files are written through a 1 MiB buffer instead of the 8 KiB default
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Model name cleanup patterns, compiled once rather than looked up on every call
+OPUS_MODEL_RE = re.compile(r'claude-opus-4.*')
+O3_MODEL_RE = re.compile(r'o3.*')
+FILENAME_UNSAFE_RE = re.compile(r'[^a-z0-9\-_]')
+REPEATED_DASHES_RE = re.compile(r'-+')
+
+def _intern(value):
+    """Intern value if it is a string; other values (e.g. a null from the model) pass through."""
+    return sys.intern(value) if isinstance(value, str) else value
+
 class ResultsManager:
     """Manages storage and export of LLM analysis results."""
     
-    def __init__(self, model_name: str = "unknown"):
+    # Results are stored as tuples in csv_headers order; positions read by the summary
+    _IDX_DECISION = 1
+    _IDX_CATEGORY = 2
+    
+    def __init__(self, model_name: str = "unknown", stream_dir: Optional[str] = None,
+                 flush_every: Optional[int] = None):
+        """
+        Args:
+            model_name: Model used for the analyses, included in output filenames
+            stream_dir: If set, results and errors are also appended to their CSV
+                files in this directory as they are added, instead of only being
+                written out by the export methods
+            flush_every: Flush the streamed files every this many rows. None (the
+                default) leaves flushing to the write buffer and close(); 1 makes
+                every row durable at the cost of a write per row
+        """
         self.results = []
         self.errors = []
-        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.stream_dir = stream_dir
+        self._csv_file = None  # Open streamed results CSV, and its writer
+        self._csv_writer = None
+        self._csv_path = None
+        self._errors_csv_file = None  # Open streamed errors CSV, and its writer
+        self._errors_csv_writer = None
+        self._errors_csv_path = None
+        self.flush_every = flush_every
+        self._rows_since_flush = 0
+        self._created_dirs = set()  # Output directories already ensured by this manager
+        self.timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self._last_ts_sec = None  # Second of the cached row timestamp
+        self._last_ts_str = None
+        self._batch_ts = None  # Timestamp shared by all rows added inside batch()
         self.model_name = self._sanitize_model_name(model_name)
         
         # CSV headers as specified in the requirements
@@ -28,54 +77,180 @@ class ResultsManager:
             "source_file",
             "timestamp"
         ]
+        self.error_headers = ["source_file", "error_message", "timestamp"]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Flush and close any streamed CSV files; the export methods still return their paths."""
+        for csv_file in (self._csv_file, self._errors_csv_file):
+            if csv_file is not None:
+                csv_file.close()
+        self._csv_file = self._csv_writer = None
+        self._errors_csv_file = self._errors_csv_writer = None
+    
+    def _ensure_dir(self, directory: str):
+        """Create directory if needed, at most once per directory for this manager."""
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+    
+    def _open_stream(self, filename: str, headers: List[str], filepath: Optional[str] = None):
+        """
+        Reopen filepath (a stream this manager created earlier) for appending, or
+        create a new CSV file in stream_dir and write its header.
+        
+        Filenames have one-second resolution, so another run of the same model can
+        already own the name; the new file then gets a numeric suffix instead of
+        being appended to.
+        """
+        if filepath is not None:
+            csv_file = open(filepath, 'a', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+            return csv_file, csv.writer(csv_file), filepath
+        
+        self._ensure_dir(self.stream_dir)
+        stem, ext = os.path.splitext(filename)
+        for attempt in count(1):
+            filepath = os.path.join(self.stream_dir, filename if attempt == 1 else f"{stem}_{attempt}{ext}")
+            try:
+                csv_file = open(filepath, 'x', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+                break
+            except FileExistsError:
+                continue
+        
+        writer = csv.writer(csv_file)
+        writer.writerow(headers)
+        return csv_file, writer, filepath
+    
+    def _streamed_into(self, stream_path: Optional[str], output_dir: str) -> bool:
+        """Whether stream_path is a streamed file inside output_dir."""
+        return stream_path is not None and os.path.dirname(os.path.abspath(stream_path)) == os.path.abspath(output_dir)
+    
+    def _stream_result(self, csv_row: tuple):
+        """Append a result row to the streamed results CSV, opening it on first use."""
+        try:
+            if self._csv_writer is None:
+                self._csv_file, self._csv_writer, self._csv_path = self._open_stream(
+                    self._results_filename(), self.csv_headers, self._csv_path
+                )
+            self._csv_writer.writerow(csv_row)
+            self._count_streamed_row()
+        except Exception as e:
+            logger.error(f"Error streaming result for {csv_row[-2]}: {e}")
+    
+    def _stream_error(self, error_record: Dict[str, str]):
+        """Append an error record to the streamed errors CSV, opening it on first use."""
+        try:
+            if self._errors_csv_writer is None:
+                self._errors_csv_file, self._errors_csv_writer, self._errors_csv_path = self._open_stream(
+                    self._errors_csv_filename(), self.error_headers, self._errors_csv_path
+                )
+            self._errors_csv_writer.writerow(itemgetter(*self.error_headers)(error_record))
+            self._count_streamed_row()
+        except Exception as e:
+            logger.error(f"Error streaming error record for {error_record['source_file']}: {e}")
+    
+    def _count_streamed_row(self):
+        """Flush the streamed files once flush_every rows have been written since the last flush."""
+        if not self.flush_every:
+            return
+        
+        self._rows_since_flush += 1
+        if self._rows_since_flush >= self.flush_every:
+            for csv_file in (self._csv_file, self._errors_csv_file):
+                if csv_file is not None:
+                    csv_file.flush()
+            self._rows_since_flush = 0
+    
+    def _results_filename(self) -> str:
+        return f"evidence_base_classifier_results_{self.model_name}_{self.timestamp}.csv"
+    
+    def _errors_csv_filename(self) -> str:
+        return f"evidence_base_classifier_errors_{self.model_name}_{self.timestamp}.csv"
     
     def _sanitize_model_name(self, model_name: str) -> str:
         """Sanitize model name for use in filenames."""
-        import re
         # Replace common model name patterns with cleaner versions
         sanitized = model_name.lower()
-        sanitized = re.sub(r'claude-opus-4.*', 'claude-opus-4', sanitized)
-        sanitized = re.sub(r'o3.*', 'o3', sanitized)
+        sanitized = OPUS_MODEL_RE.sub('claude-opus-4', sanitized)
+        sanitized = O3_MODEL_RE.sub('o3', sanitized)
         # Remove any characters that aren't alphanumeric, dash, or underscore
-        sanitized = re.sub(r'[^a-z0-9\-_]', '-', sanitized)
+        sanitized = FILENAME_UNSAFE_RE.sub('-', sanitized)
         # Remove multiple consecutive dashes
-        sanitized = re.sub(r'-+', '-', sanitized)
+        sanitized = REPEATED_DASHES_RE.sub('-', sanitized)
         # Remove leading/trailing dashes
         sanitized = sanitized.strip('-')
         return sanitized if sanitized else "unknown"
     
+    @contextmanager
+    def batch(self):
+        """
+        Stamp every result and error added inside the with-block with one timestamp.
+        
+        The clock is read once on entry instead of once per row.
+        """
+        previous_ts = self._batch_ts
+        self._batch_ts = self._now_iso()
+        try:
+            yield self
+        finally:
+            self._batch_ts = previous_ts
+    
+    def _now_iso(self) -> str:
+        """Current local time as an ISO string at one-second resolution, rebuilt at most once per second."""
+        if self._batch_ts is not None:
+            return self._batch_ts
+        
+        sec = int(time.time())
+        if sec != self._last_ts_sec:
+            self._last_ts_sec = sec
+            self._last_ts_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        return self._last_ts_str
+    
     def add_result(self, llm_result: Dict[str, Any], source_file: str):
         """Add a successful LLM analysis result."""
+        # Only building the row can fail (e.g. a non-dict result); appending and
+        # streaming it below cannot raise
         try:
-            # Map LLM result to CSV format
-            csv_row = {
-                "article_title": llm_result.get("article_title", ""),
-                "inclusion_exclusion_decision": llm_result.get("inclusion_decision", ""),
-                "category": llm_result.get("category", ""),
-                "detailed_reasoning_for_decision": llm_result.get("detailed_reasoning", ""),
-                "citation": "",  # Not extracted by LLM - would need separate processing
-                "open_access_url": "",  # Not extracted by LLM - would need separate processing
-                "confidence": "",  # Not provided by current LLM schema
-                "source_file": source_file,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            self.results.append(csv_row)
-            logger.info(f"Added result for {source_file}")
-            
+            get = llm_result.get
+            # Map LLM result to a CSV row, in csv_headers order. Decisions and categories
+            # come from a handful of values, so rows share one interned copy of each
+            csv_row = (
+                get("article_title", ""),
+                _intern(get("inclusion_decision", "")),
+                _intern(get("category", "")),
+                get("detailed_reasoning", ""),
+                "",  # citation: not extracted by LLM - would need separate processing
+                "",  # open_access_url: not extracted by LLM - would need separate processing
+                "",  # confidence: not provided by current LLM schema
+                source_file,
+                self._now_iso()
+            )
         except Exception as e:
             error_msg = f"Error adding result for {source_file}: {str(e)}"
             logger.error(error_msg)
             self.add_error(source_file, error_msg)
+            return
+        
+        self.results.append(csv_row)
+        if self.stream_dir:
+            self._stream_result(csv_row)
+        logger.info(f"Added result for {source_file}")
     
     def add_error(self, source_file: str, error_message: str):
         """Add an error record."""
         error_record = {
             "source_file": source_file,
             "error_message": error_message,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": self._now_iso()
         }
         self.errors.append(error_record)
+        if self.stream_dir:
+            self._stream_error(error_record)
         logger.error(f"Added error for {source_file}: {error_message}")
     
     def get_stats(self) -> Dict[str, int]:
@@ -86,20 +261,97 @@ class ResultsManager:
             "failed": len(self.errors)
         }
     
-    def export_to_csv(self, output_dir: str = "output") -> str:
-        """Export results to CSV file."""
+    def _write_results_csv(self, out, batch_size: int = 1024):
+        """Write the header and result rows as CSV to a text stream, batch_size rows per writerows call."""
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        
+        writer = csv.writer(out)
+        writer.writerow(self.csv_headers)
+        rows = iter(self.results)
+        while batch := list(islice(rows, batch_size)):
+            writer.writerows(batch)
+    
+    def _render_results_csv(self) -> str:
+        """Render results as CSV text."""
+        buffer = io.StringIO(newline='')
+        self._write_results_csv(buffer)
+        return buffer.getvalue()
+    
+    def _render_errors_csv(self) -> str:
+        """Render errors as CSV text."""
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(self.error_headers)
+        writer.writerows(map(itemgetter(*self.error_headers), self.errors))
+        return buffer.getvalue()
+    
+    def _render_errors_text(self) -> str:
+        """Render errors as a plain-text log."""
+        parts = [
+            "Evidence Base Classifier - Error Log\n",
+            f"Generated: {datetime.now().isoformat()}\n",
+            f"Total Errors: {len(self.errors)}\n",
+            "=" * 50 + "\n\n"
+        ]
+        
+        separator = "-" * 30 + "\n\n"
+        parts.extend(
+            f"Error #{i}\n"
+            f"File: {error['source_file']}\n"
+            f"Time: {error['timestamp']}\n"
+            f"Error: {error['error_message']}\n"
+            f"{separator}"
+            for i, error in enumerate(self.errors, 1)
+        )
+        
+        return "".join(parts)
+    
+    def export_to_csv_bytes(self) -> bytes:
+        """Export results as in-memory CSV bytes (e.g. for a download button)."""
         try:
-            os.makedirs(output_dir, exist_ok=True)
+            return self._render_results_csv().encode('utf-8')
+        except Exception as e:
+            error_msg = f"Error exporting to CSV: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def export_errors_to_csv_bytes(self) -> bytes:
+        """Export errors as in-memory CSV bytes."""
+        try:
+            return self._render_errors_csv().encode('utf-8')
+        except Exception as e:
+            error_msg = f"Error exporting errors to CSV: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def export_errors_to_text_bytes(self) -> bytes:
+        """Export errors as in-memory text log bytes."""
+        try:
+            return self._render_errors_text().encode('utf-8')
+        except Exception as e:
+            error_msg = f"Error exporting errors to text: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def export_to_csv(self, output_dir: str = "output", batch_size: int = 1024) -> str:
+        """Export results to CSV file, written straight to disk batch_size rows at a time."""
+        try:
+            self._ensure_dir(output_dir)
+            
+            # Rows already streamed into output_dir only need flushing
+            if self._streamed_into(self._csv_path, output_dir):
+                if self._csv_file is not None:
+                    self._csv_file.flush()
+                logger.info(f"Results streamed to {self._csv_path}")
+                return self._csv_path
             
             # Generate filename with model name
-            filename = f"evidence_base_classifier_results_{self.model_name}_{self.timestamp}.csv"
-            filepath = os.path.join(output_dir, filename)
+            filepath = os.path.join(output_dir, self._results_filename())
             
             # Write CSV
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=self.csv_headers)
-                writer.writeheader()
-                writer.writerows(self.results)
+            with open(filepath, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as csvfile:
+                self._write_results_csv(csvfile, batch_size)
             
             logger.info(f"Exported {len(self.results)} results to {filepath}")
             return filepath
@@ -112,18 +364,21 @@ class ResultsManager:
     def export_errors_to_csv(self, output_dir: str = "output") -> str:
         """Export errors to CSV file."""
         try:
-            os.makedirs(output_dir, exist_ok=True)
+            self._ensure_dir(output_dir)
+            
+            # Rows already streamed into output_dir only need flushing
+            if self._streamed_into(self._errors_csv_path, output_dir):
+                if self._errors_csv_file is not None:
+                    self._errors_csv_file.flush()
+                logger.info(f"Errors streamed to {self._errors_csv_path}")
+                return self._errors_csv_path
             
             # Generate filename with model name
-            filename = f"evidence_base_classifier_errors_{self.model_name}_{self.timestamp}.csv"
-            filepath = os.path.join(output_dir, filename)
+            filepath = os.path.join(output_dir, self._errors_csv_filename())
             
             # Write CSV
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ["source_file", "error_message", "timestamp"]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.errors)
+            with open(filepath, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as csvfile:
+                csvfile.write(self._render_errors_csv())
             
             logger.info(f"Exported {len(self.errors)} errors to {filepath}")
             return filepath
@@ -136,25 +391,15 @@ class ResultsManager:
     def export_errors_to_text(self, output_dir: str = "logs") -> str:
         """Export errors to text file."""
         try:
-            os.makedirs(output_dir, exist_ok=True)
+            self._ensure_dir(output_dir)
             
             # Generate filename with model name
             filename = f"evidence_base_classifier_errors_{self.model_name}_{self.timestamp}.txt"
             filepath = os.path.join(output_dir, filename)
             
             # Write text file
-            with open(filepath, 'w', encoding='utf-8') as txtfile:
-                txtfile.write(f"Evidence Base Classifier - Error Log\n")
-                txtfile.write(f"Generated: {datetime.now().isoformat()}\n")
-                txtfile.write(f"Total Errors: {len(self.errors)}\n")
-                txtfile.write("=" * 50 + "\n\n")
-                
-                for i, error in enumerate(self.errors, 1):
-                    txtfile.write(f"Error #{i}\n")
-                    txtfile.write(f"File: {error['source_file']}\n")
-                    txtfile.write(f"Time: {error['timestamp']}\n")
-                    txtfile.write(f"Error: {error['error_message']}\n")
-                    txtfile.write("-" * 30 + "\n\n")
+            with open(filepath, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as txtfile:
+                txtfile.write(self._render_errors_text())
             
             logger.info(f"Exported {len(self.errors)} errors to {filepath}")
             return filepath
@@ -168,43 +413,46 @@ class ResultsManager:
         """Get a formatted summary of results."""
         stats = self.get_stats()
         
-        summary = f"""
-## Processing Summary
-- **Total files processed:** {stats['total_processed']}
-- **Successfully analyzed:** {stats['successful']}
-- **Failed to analyze:** {stats['failed']}
-        """
+        lines = [
+            "## Processing Summary",
+            f"- **Total files processed:** {stats['total_processed']}",
+            f"- **Successfully analyzed:** {stats['successful']}",
+            f"- **Failed to analyze:** {stats['failed']}"
+        ]
         
         if self.results:
-            # Count by decision
-            included = sum(1 for r in self.results if r['inclusion_exclusion_decision'] == 'Included')
-            excluded = sum(1 for r in self.results if r['inclusion_exclusion_decision'] == 'Excluded')
+            # Count by decision, and by category for included papers, in one pass
+            decisions = Counter()
+            categories = Counter()
+            for r in self.results:
+                decision = r[self._IDX_DECISION]
+                decisions[decision] += 1
+                if decision == 'Included':
+                    categories[r[self._IDX_CATEGORY]] += 1
+            included = decisions['Included']
+            excluded = decisions['Excluded']
             
-            summary += f"\n### Analysis Results\n"
-            summary += f"- **Included papers:** {included}\n"
-            summary += f"- **Excluded papers:** {excluded}\n"
+            lines.extend([
+                "",
+                "### Analysis Results",
+                f"- **Included papers:** {included}",
+                f"- **Excluded papers:** {excluded}"
+            ])
             
-            # Count by category (for included papers)
+            # Categories of included papers
             if included > 0:
-                categories = {}
-                for r in self.results:
-                    if r['inclusion_exclusion_decision'] == 'Included':
-                        cat = r['category']
-                        categories[cat] = categories.get(cat, 0) + 1
-                
-                summary += f"\n### Categories (Included Papers)\n"
-                for cat, count in categories.items():
-                    summary += f"- **{cat}:** {count}\n"
+                lines.extend(["", "### Categories (Included Papers)"])
+                lines.extend(f"- **{cat}:** {count}" for cat, count in categories.items())
         
-        return summary
+        return "\n".join(lines) + "\n"
     
-    def get_failed_files_for_display(self) -> List[Dict[str, str]]:
-        """Get failed files formatted for UI display."""
-        return [
+    def get_failed_files_for_display(self, limit: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """Lazily yield failed files formatted for UI display, optionally only the first limit of them."""
+        return (
             {
                 "File": error["source_file"],
                 "Error Reason": error["error_message"],
                 "Timestamp": error["timestamp"]
             }
-            for error in self.errors
-        ] 
\ No newline at end of file
+            for error in islice(self.errors, limit)
+        )